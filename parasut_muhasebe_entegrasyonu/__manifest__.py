@@ -1,6 +1,6 @@
 {
     'name': 'Paraşüt Odoo Muhasebe Entegrasyonu',
-    'version': '19.0.1.1.9',
+    'version': '19.0.1.1.11',
     'summary': 'Paraşüt ve Odoo arasında otomatik muhasebe senkronizasyonu',
     'description': """
 Paraşüt Odoo Muhasebe Entegrasyonu (Woodique Edition)
@@ -0,0 +1,16 @@
+from odoo.tools.sql import drop_index, make_index_name
+
+# parasut_id indexes are now partial (WHERE parasut_id IS NOT NULL). Odoo keeps an existing index
+# of the same name as is, so drop the old full indexes and let the registry recreate them.
+TABLES = [
+    'account_journal',
+    'account_move',
+    'hr_employee',
+    'product_template',
+    'res_partner',
+]
+
+
+def migrate(cr, version):
+    for table in TABLES:
+        drop_index(cr, make_index_name(table, 'parasut_id'), table)
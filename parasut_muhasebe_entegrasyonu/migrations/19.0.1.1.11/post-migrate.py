@@ -0,0 +1,10 @@
+from odoo import api, SUPERUSER_ID
+
+# The cron records are noupdate: point the existing daily cron at the sync queue as well.
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    cron = env.ref('parasut_muhasebe_entegrasyonu.ir_cron_parasut_sync_all', raise_if_not_found=False)
+    if cron:
+        cron.code = 'model.action_queue_full_sync()'
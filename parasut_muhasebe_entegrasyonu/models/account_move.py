@@ -1,11 +1,21 @@
 from odoo import fields, models
+from odoo.tools.sql import create_index
 
 class AccountMove(models.Model):
     _inherit = 'account.move'
 
-    parasut_id = fields.Char(string='Parasut Invoice ID', help="Unique ID from Parasut", copy=False, index=True)
+    parasut_id = fields.Char(string='Parasut Invoice ID', help="Unique ID from Parasut", copy=False, index='btree_not_null')
     parasut_payment_status = fields.Selection([
         ('unpaid', 'Unpaid'),
         ('paid', 'Paid'),
         ('partially_paid', 'Partially Paid')
     ], string='Parasut Payment Status', help="Payment status received from Parasut")
+
+    def _auto_init(self):
+        res = super()._auto_init()
+        # Invoice dedupe filters on (parasut_id, move_type); only synced moves carry a parasut_id
+        create_index(
+            self.env.cr, 'account_move_parasut_id_move_type_index', self._table,
+            ['parasut_id', 'move_type'], where='parasut_id IS NOT NULL',
+        )
+        return res
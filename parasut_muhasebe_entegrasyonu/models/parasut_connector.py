@@ -2,18 +2,139 @@ import requests
 import json
 import time
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import SQL, float_compare
 
 _logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Pooled HTTP sessions shared by all workers of this process, keyed by (client_id, company_id)
+_SESSIONS = {}
+
+# Worker threads shared by all concurrent Parasut requests of this process; they only run
+# HTTP calls on the pooled sessions above, sized to match the session pool (pool_maxsize)
+_HTTP_EXECUTOR = ThreadPoolExecutor(max_workers=20, thread_name_prefix='parasut_http')
+
+# Bearer tokens keyed by (client_id, username):
+# {'client_id', 'username', 'access_token', 'refresh_token', 'expires_at'}
+_TOKEN_CACHE = {}
+_TOKEN_LOCK = threading.Lock()
+
+# Bulk imports need no chatter messages, tracking values or followers
+_IMPORT_CONTEXT = {
+    'tracking_disable': True,
+    'mail_create_nolog': True,
+    'mail_notrack': True,
+    'mail_create_nosubscribe': True,
+}
+
+# Parasut endpoint holding the payments of a move, by the prefix of its ref; anything else is a purchase bill
+_REF_ENDPOINTS = {
+    'MAAS-': 'salaries',
+    'VERGI-': 'taxes',
+    'PRS-': 'purchase_bills',
+}
+
+# (label, attribute) pairs of a Parasut contact copied into the partner notes
+_CONTACT_NOTE_FIELDS = (
+    ("Kısa", 'short_name'),
+    ("IBAN", 'iban'),
+    ("Cep", 'mobile_phone'),
+)
+
+# Sync actions that can be queued for the background cron, in the order they must run
+_SYNC_ACTIONS = (
+    'action_sync_accounts',
+    'action_sync_contacts',
+    'action_sync_products',
+    'action_sync_sales_invoices',
+    'action_sync_purchase_bills',
+    'action_sync_payments',
+)
+
+class _RateLimiter:
+    """ Pause Parasut requests of this process while X-RateLimit-Remaining reports 0. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def update(self, response, *args, **kwargs):
+        """ Response hook: pause for Retry-After seconds once the rate limit is used up. """
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if not (remaining and remaining.isdigit() and int(remaining) == 0):
+            return
+        try:
+            delay = float(response.headers.get('Retry-After') or 1)
+        except ValueError:
+            delay = 1.0
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+_RATE_LIMITER = _RateLimiter()
+
+def _rel(resource, key):
+    """ Return the data of a JSON:API relationship of `resource`, or None when it is not set. """
+    relationships = resource.get('relationships')
+    if not relationships or not relationships.get(key):
+        return None
+    return relationships[key].get('data')
+
+def _decode_json(response):
+    """ Decode a response body with orjson when it is installed, else with requests' stdlib decoder. """
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
 class ParasutConnector(models.TransientModel):
     _name = 'parasut.connector'
     _description = 'Parasut Integration Connector'
 
+    sync_last_run = fields.Datetime(string='Last Background Sync', compute='_compute_sync_status')
+    sync_last_error = fields.Text(string='Last Background Sync Errors', compute='_compute_sync_status')
+
+    def _compute_sync_status(self):
+        params = self.env['ir.config_parameter'].sudo()
+        for connector in self:
+            connector.sync_last_run = params.get_param('parasut.sync_last_run') or False
+            connector.sync_last_error = params.get_param('parasut.sync_last_error') or False
+
+    @api.model
+    def _get_session(self, client_id=None, company_id=None):
+        """ Return a keep-alive session with connection pooling and retries for the given credentials. """
+        if client_id is None or company_id is None:
+            params = self.env['ir.config_parameter'].sudo()
+            client_id = client_id or params.get_param('parasut.client_id')
+            company_id = company_id or params.get_param('parasut.company_id')
+        key = (client_id, company_id)
+        session = _SESSIONS.get(key)
+        if session is None:
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
+            session.headers.update({'Accept': 'application/json'})
+            session.hooks['response'].append(_RATE_LIMITER.update)
+            _SESSIONS[key] = session
+        return session
+
     @api.model
-    def _get_parasut_headers(self):
-        """ Fetch credentials from settings and return headers with token. """
+    def _get_token(self, force_refresh=False):
+        """ Return (access_token, expires_at), refreshing the cached token when it is about to expire. """
         params = self.env['ir.config_parameter'].sudo()
         client_id = params.get_param('parasut.client_id')
         client_secret = params.get_param('parasut.client_secret')
@@ -23,126 +144,398 @@ class ParasutConnector(models.TransientModel):
         if not all([client_id, client_secret, username, password]):
             raise UserError(_("Parasut API credentials are not fully configured in Settings."))
 
-        token_url = "https://api.parasut.com/oauth/token"
-        payload = {
-            'client_id': client_id,
-            'client_secret': client_secret,
-            'username': username,
-            'password': password,
-            'grant_type': 'password',
-            'redirect_uri': 'urn:ietf:wg:oauth:2.0:oob',
-        }
-        try:
-            response = requests.post(token_url, data=payload, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            return {
-                'Authorization': f"Bearer {data['access_token']}",
-                'Content-Type': 'application/json'
+        key = (client_id, username)
+        # Serialize refreshes so concurrent syncs of this process do not each mint a token
+        with _TOKEN_LOCK:
+            cached = _TOKEN_CACHE.get(key)
+            if not cached:
+                # Fall back to the token persisted by another worker or a previous cron run
+                cached = self._load_token_cache()
+                if (cached.get('client_id'), cached.get('username')) == key:
+                    _TOKEN_CACHE[key] = cached
+                else:
+                    cached = None
+            if cached and not force_refresh and cached['expires_at'] > time.time():
+                return cached['access_token'], cached['expires_at']
+
+            token_url = "https://api.parasut.com/oauth/token"
+            session = self._get_session()
+            payload = {
+                'client_id': client_id,
+                'client_secret': client_secret,
+                'redirect_uri': 'urn:ietf:wg:oauth:2.0:oob',
             }
+            data = None
+            if cached and cached.get('refresh_token'):
+                try:
+                    response = session.post(token_url, data=dict(
+                        payload, grant_type='refresh_token', refresh_token=cached['refresh_token'],
+                    ), headers={'Authorization': None}, timeout=15)
+                    response.raise_for_status()
+                    data = _decode_json(response)
+                except Exception as e:
+                    _logger.info("Parasut token refresh failed, using password grant: %s", str(e))
+            if data is None:
+                try:
+                    response = session.post(token_url, data=dict(
+                        payload, grant_type='password', username=username, password=password,
+                    ), headers={'Authorization': None}, timeout=15)
+                    response.raise_for_status()
+                    data = _decode_json(response)
+                except Exception as e:
+                    _logger.error("Parasut Authentication Failed: %s", str(e))
+                    raise UserError(_("Could not authenticate with Parasut. Please check credentials in General Settings."))
+
+            # Refresh a minute early so a token never expires mid-sync
+            cached = {
+                'client_id': client_id,
+                'username': username,
+                'access_token': data['access_token'],
+                'refresh_token': data.get('refresh_token'),
+                'expires_at': time.time() + data.get('expires_in', 7200) - 60,
+            }
+            _TOKEN_CACHE[key] = cached
+            stored = json.dumps(cached)
+        self._store_token_cache(stored)
+        return cached['access_token'], cached['expires_at']
+
+    @api.model
+    def _load_token_cache(self):
+        """ Read the persisted token cache through a fresh cursor to see tokens of other workers. """
+        with self.env.registry.cursor() as cr:
+            cr.execute("SELECT value FROM ir_config_parameter WHERE key = %s", ['parasut.token_cache'])
+            row = cr.fetchone()
+        try:
+            return json.loads(row and row[0] or '{}')
+        except ValueError:
+            return {}
+
+    @api.model
+    def _store_token_cache(self, value):
+        """ Persist the token cache in its own short transaction; call without holding _TOKEN_LOCK. """
+        try:
+            with self.env.registry.cursor() as cr:
+                self.env(cr=cr)['ir.config_parameter'].sudo().set_param('parasut.token_cache', value)
         except Exception as e:
-            _logger.error("Parasut Authentication Failed: %s", str(e))
-            raise UserError(_("Could not authenticate with Parasut. Please check credentials in General Settings."))
+            # Only a cross-worker optimization: the in-process cache stays valid
+            _logger.warning("Could not persist the Parasut token cache: %s", str(e))
 
-    def _fetch_from_parasut(self, endpoint, params=None):
-        """ Helper to fetch pages from Parasut API. """
-        headers = self._get_parasut_headers()
-        base_url = "https://api.parasut.com/v4"
+    @api.model
+    def _get_cached_token(self, client_id, username):
+        """ Return the still valid access token cached in this process for these credentials, if any. """
+        with _TOKEN_LOCK:
+            cached = _TOKEN_CACHE.get((client_id, username))
+            if cached and cached['expires_at'] > time.time():
+                return cached['access_token']
+        return None
+
+    @api.model
+    def _invalidate_token(self):
+        """ Expire the cached access token, keeping its refresh token. """
+        params = self.env['ir.config_parameter'].sudo()
+        key = (params.get_param('parasut.client_id'), params.get_param('parasut.username'))
+        with _TOKEN_LOCK:
+            cached = _TOKEN_CACHE.get(key)
+            if cached:
+                cached['expires_at'] = 0
+            stored = json.dumps(cached) if cached else False
+        self._store_token_cache(stored)
+
+    @api.model
+    def _get_authorized_session(self, force_refresh=False):
+        """ Return the pooled session with a valid bearer token bound to it. """
+        session = self._get_session()
+        authorization = f"Bearer {self._get_token(force_refresh=force_refresh)[0]}"
+        if session.headers.get('Authorization') != authorization:
+            session.headers['Authorization'] = authorization
+        return session
+
+    @api.model
+    def _get_api_url(self, endpoint):
+        """ Return the v4 API URL of an endpoint for the Parasut company configured in Settings. """
         company_id = self.env['ir.config_parameter'].sudo().get_param('parasut.company_id')
         if not company_id:
             raise UserError(_("Parasut Company ID is missing in Settings."))
-            
-        url = f"{base_url}/{company_id}/{endpoint}"
-        
-        results = []
-        page = 1
-        while True:
+        return f"https://api.parasut.com/v4/{company_id}/{endpoint}"
+
+    def _fetch_from_parasut(self, endpoint, params=None, conditional=False):
+        """ Helper to fetch pages from Parasut API, yielding one {'data', 'included'} batch per page. """
+        url = self._get_api_url(endpoint)
+        config = self.env['ir.config_parameter'].sudo()
+        session = self._get_authorized_session()
+
+        etag_param = f'parasut.etag.{endpoint}'
+        etag_cache = json.loads(config.get_param(etag_param) or '{}') if conditional else {}
+        old_etags = etag_cache.get('etags', {})
+        new_etags = {}
+
+        # Runs in worker threads: only touches the HTTP session, never self.env
+        def get_page(page):
             current_params = params.copy() if params else {}
             current_params['page[size]'] = 25
             current_params['page[number]'] = page
-            
+            page_headers = None
+            if old_etags.get(str(page)):
+                page_headers = {'If-None-Match': old_etags[str(page)]}
+            _RATE_LIMITER.wait()
+            return session.get(url, headers=page_headers, params=current_params, timeout=30)
+
+        def read_page(page, resp):
+            if resp.status_code == 304:
+                new_etags[str(page)] = old_etags[str(page)]
+                return None
+            resp.raise_for_status()
+            if conditional and resp.headers.get('ETag'):
+                new_etags[str(page)] = resp.headers['ETag']
+            return _decode_json(resp)
+
+        page_count = 0
+
+        def iter_pages():
+            nonlocal page_count
+            resp = get_page(1)
+            if resp.status_code == 401:
+                # Cached token was revoked or expired early: refresh once and retry the page
+                self._invalidate_token()
+                self._get_authorized_session(force_refresh=True)
+                resp = get_page(1)
+            first = read_page(1, resp)
+            if first is None:
+                page_count = etag_cache.get('page_count', 1)
+            else:
+                page_count = min(first.get('meta', {}).get('page_count', 0), 21) # Limit for safety
+            yield first
+            if page_count < 2:
+                return
+
+            # Keep a bounded number of pages in flight ahead of the page being processed; small enough
+            # to stay under Parasut's rate limit, 429s are retried with Retry-After by the session adapter
+            in_flight = min(5, page_count - 1)
+            pending = deque()
+            next_page = 2
             try:
-                resp = requests.get(url, headers=headers, params=current_params, timeout=30)
-                resp.raise_for_status()
-                json_data = resp.json()
-                
+                while pending or next_page <= page_count:
+                    while next_page <= page_count and len(pending) < in_flight:
+                        pending.append((next_page, _HTTP_EXECUTOR.submit(get_page, next_page)))
+                        next_page += 1
+                    page, future = pending.popleft()
+                    yield read_page(page, future.result())
+            finally:
+                for _page, future in pending:
+                    future.cancel()
+
+        try:
+            for json_data in iter_pages():
+                if json_data is None:
+                    continue # Unchanged since the last sync
                 data_list = json_data.get('data', [])
                 if not data_list:
                     break
-                    
-                results.append({
+                yield {
                     'data': data_list,
                     'included': json_data.get('included', [])
-                })
-                
-                meta = json_data.get('meta', {})
-                if page >= meta.get('page_count', 0) or page > 20: # Limit for safety
-                    break
-                page += 1
+                }
+        except Exception as e:
+            _logger.error("Error fetching %s from Parasut: %s", endpoint, str(e))
+            return # Stop at the failed page to avoid partial data issues
+
+        if conditional and new_etags:
+            # Stored in the sync transaction, so a failed sync does not mark its pages as seen
+            config.set_param(etag_param, json.dumps({'page_count': page_count, 'etags': new_etags}))
+
+    def _fetch_parasut_records(self, endpoint, record_ids, params=None):
+        """ Fetch single records from Parasut API concurrently, keyed by id. """
+        if not record_ids:
+            return {}
+        url = self._get_api_url(endpoint)
+        session = self._get_authorized_session()
+
+        def get_record(record_id):
+            _RATE_LIMITER.wait()
+            return session.get(f"{url}/{record_id}", params=params, timeout=10)
+
+        records = {}
+        futures = [_HTTP_EXECUTOR.submit(get_record, record_id) for record_id in record_ids]
+        for record_id, future in zip(record_ids, futures):
+            try:
+                response = future.result()
+                if response.status_code == 200:
+                    records[record_id] = _decode_json(response)
+            except (requests.RequestException, ValueError) as e:
+                _logger.error("Error fetching %s/%s from Parasut: %s", endpoint, record_id, str(e))
+        return records
+
+    def _index_included(self, included):
+        """ Index JSON:API included nodes by (type, id) for constant-time lookups. """
+        return {(inc['type'], inc['id']): inc for inc in included}
+
+    def _index_records(self, rows, key, index=None):
+        """ Map each non-empty `key` value of search_read rows to its first record id, extending `index` if given. """
+        if index is None:
+            index = {}
+        for row in rows:
+            if row[key]:
+                index.setdefault(row[key], row['id'])
+        return index
+
+    def _reindex_match(self, indexes, match, old_vals, new_vals):
+        """ Move `match` (record id or pending create vals) from the index keys of its old values to its new ones. """
+        for field, index in indexes.items():
+            old, new = old_vals.get(field), new_vals.get(field)
+            if old and old != new and (index.get(old) is match or (not isinstance(match, dict) and index.get(old) == match)):
+                del index[old]
+            if new:
+                if field == 'parasut_id':
+                    index[new] = match
+                else:
+                    index.setdefault(new, match)
+
+    def _sql_index(self, model_name, column, values, **filters):
+        """ Map `column` values to record ids with a plain SQL query, for dedupe probes. """
+        Model = self.env[model_name]
+        Model.flush_model([column, *filters])
+        conditions = [SQL("%s = ANY(%s)", SQL.identifier(column), list(values))]
+        conditions += [SQL("%s = %s", SQL.identifier(name), value) for name, value in filters.items()]
+        self.env.cr.execute(SQL(
+            "SELECT %s, id FROM %s WHERE %s",
+            SQL.identifier(column), SQL.identifier(Model._table), SQL(" AND ").join(conditions),
+        ))
+        return dict(self.env.cr.fetchall())
+
+    def _index_taxes(self):
+        """ Map (rounded amount, type_tax_use, price_include) to a tax id; price_include=None matches either. """
+        index = {}
+        for tax in self.env['account.tax'].search_read([], ['amount', 'type_tax_use', 'price_include']):
+            amount = round(tax['amount'], 4)
+            index.setdefault((amount, tax['type_tax_use'], tax['price_include']), tax['id'])
+            index.setdefault((amount, tax['type_tax_use'], None), tax['id'])
+        return index
+
+    def _find_odoo_tax(self, tax_index, vat_rate, type_tax_use, price_include=False):
+        """ Resolve a Parasut VAT rate to a tax id of the given price_include flag. """
+        return tax_index.get((round(float(vat_rate), 4), type_tax_use, price_include))
+
+    def _prepare_invoice_line(self, d_attrs, name, tax_index, type_tax_use, product_id=False):
+        """ Build the invoice_line_ids command for one Parasut invoice/bill detail. """
+        line_vals = {
+            'name': name,
+            'quantity': float(d_attrs.get('quantity', 1.0)),
+            'price_unit': float(d_attrs.get('unit_price', 0.0)),
+        }
+        if product_id:
+            line_vals['product_id'] = product_id
+        vat_rate = d_attrs.get('vat_rate')
+        if vat_rate:
+            tax_id = self._find_odoo_tax(tax_index, vat_rate, type_tax_use)
+            if tax_id:
+                line_vals['tax_ids'] = [(6, 0, [tax_id])]
+        return (0, 0, line_vals)
+
+    def _create_in_batch(self, Model, vals_list, etag_endpoint=None):
+        """ Create records in one batch, retrying rows in savepoints on failure; clears ETags on dropped rows. """
+        if not vals_list:
+            return Model
+        try:
+            with self.env.cr.savepoint():
+                return Model.create(vals_list)
+        except Exception as e:
+            _logger.warning("Batched create of %s failed, retrying per record: %s", Model._name, str(e))
+        records = Model
+        for vals in vals_list:
+            try:
+                with self.env.cr.savepoint():
+                    records |= Model.create(vals)
             except Exception as e:
-                _logger.error("Error fetching %s from Parasut: %s", endpoint, str(e))
-                break # Stop fetching on error to avoid partial data issues
-            
-        return results
-
-    def _find_in_included(self, included, type_name, item_id):
-        for inc in included:
-            if inc.get('type') == type_name and inc.get('id') == item_id:
-                return inc
-        return None
+                _logger.error("Could not create %s for Parasut ID %s: %s", Model._name, vals.get('parasut_id'), str(e))
+        if etag_endpoint and len(records) < len(vals_list):
+            self.env['ir.config_parameter'].sudo().set_param(f'parasut.etag.{etag_endpoint}', False)
+        return records
 
     # --- Sync Actions ---
 
     def action_sync_accounts(self):
-        batches = self._fetch_from_parasut('accounts')
-        Journal = self.env['account.journal']
-        created = updated = 0
-        for batch in batches:
-            for item in batch['data']:
+        Journal = self.env['account.journal'].with_context(**_IMPORT_CONTEXT)
+        by_pid, by_name = {}, {}
+        indexes = {'parasut_id': by_pid, 'name': by_name}
+        known = {}
+        to_create = []
+        # Journal codes must stay unique, archived journals included
+        existing_codes = {row['code'] for row in Journal.with_context(active_test=False).search_read([], ['code'])}
+        updated = 0
+        for batch in self._fetch_from_parasut('accounts', conditional=True):
+            items = batch['data']
+            existing = Journal.search_read([
+                '|',
+                ('parasut_id', 'in', [item['id'] for item in items]),
+                ('name', 'in', [item['attributes']['name'] for item in items if item['attributes'].get('name')]),
+            ], ['parasut_id', 'name'])
+            self._index_records(existing, 'parasut_id', by_pid)
+            self._index_records(existing, 'name', by_name)
+            known.update((row['id'], row) for row in existing)
+            for item in items:
                 attrs = item['attributes']
                 p_id = item['id']
                 name = attrs.get('name')
                 acc_type = 'cash' if attrs.get('account_type') == 'cash' else 'bank'
                 
-                journal = Journal.search([('parasut_id', '=', p_id)], limit=1)
-                if not journal:
-                    journal = Journal.search([('name', '=', name)], limit=1)
+                match = by_pid.get(p_id) or by_name.get(name)
                 
                 vals = {'parasut_id': p_id, 'name': name, 'type': acc_type}
-                if journal:
-                    journal.write(vals)
+                if isinstance(match, dict):
+                    # Same record as an earlier item that is still waiting to be created
+                    old_vals = dict(match)
+                    match.update(vals)
+                    updated += 1
+                elif match:
+                    old_vals = known[match]
+                    Journal.browse(match).write(vals)
+                    known[match] = dict(old_vals, **vals)
                     updated += 1
                 else:
+                    old_vals = {}
                     code_base = name[:5].upper().replace(" ", "")
                     code = code_base
                     counter = 1
-                    while Journal.search([('code', '=', code)]):
+                    while code in existing_codes:
                         code = f"{code_base[:4]}{counter}"
                         counter += 1
                     vals['code'] = code
-                    Journal.create(vals)
-                    created += 1
+                    existing_codes.add(code)
+                    to_create.append(vals)
+                    match = vals
+                self._reindex_match(indexes, match, old_vals, vals)
+        created = len(self._create_in_batch(Journal, to_create, etag_endpoint='accounts'))
         return self._return_notification("Accounts Synced", f"{created} created, {updated} updated.")
 
     def action_sync_contacts(self):
-        batches = self._fetch_from_parasut('contacts', params={'sort': 'id'})
-        Partner = self.env['res.partner']
-        created = updated = 0
-        for batch in batches:
-            for item in batch['data']:
+        Partner = self.env['res.partner'].with_context(**_IMPORT_CONTEXT)
+        by_pid, by_vat, by_name = {}, {}, {}
+        indexes = {'parasut_id': by_pid, 'vat': by_vat, 'name': by_name}
+        known = {}
+        to_create = []
+        updated = 0
+        for batch in self._fetch_from_parasut('contacts', params={'sort': 'id'}, conditional=True):
+            items = batch['data']
+            existing = Partner.search_read([
+                '|', '|',
+                ('parasut_id', 'in', [item['id'] for item in items]),
+                ('vat', 'in', [item['attributes']['tax_number'] for item in items if item['attributes'].get('tax_number')]),
+                ('name', 'in', [item['attributes']['name'] for item in items if item['attributes'].get('name')]),
+            ], ['parasut_id', 'vat', 'name'])
+            self._index_records(existing, 'parasut_id', by_pid)
+            self._index_records(existing, 'vat', by_vat)
+            self._index_records(existing, 'name', by_name)
+            known.update((row['id'], row) for row in existing)
+            for item in items:
                 attrs = item['attributes']
                 p_id = item['id']
                 
-                address_parts = [attrs.get('address'), attrs.get('district')]
-                if attrs.get('tax_office'):
-                    address_parts.append(f"Vergi D.: {attrs.get('tax_office')}")
-                full_address = "\n".join([p for p in address_parts if p])
-                
-                notes_parts = []
-                if attrs.get('short_name'): notes_parts.append(f"Kısa: {attrs.get('short_name')}")
-                if attrs.get('iban'): notes_parts.append(f"IBAN: {attrs.get('iban')}")
-                if attrs.get('mobile_phone'): notes_parts.append(f"Cep: {attrs.get('mobile_phone')}")
-                notes = "\n".join(notes_parts)
+                full_address = "\n".join(filter(None, (
+                    attrs.get('address'),
+                    attrs.get('district'),
+                    attrs.get('tax_office') and f"Vergi D.: {attrs['tax_office']}",
+                )))
+                notes = "\n".join(f"{label}: {attrs[key]}" for label, key in _CONTACT_NOTE_FIELDS if attrs.get(key))
                 
                 vals = {
                     'parasut_id': p_id,
@@ -158,26 +551,49 @@ class ParasutConnector(models.TransientModel):
                     'customer_rank': 1 if attrs.get('contact_type') == 'customer' else 0,
                 }
                 
-                partner = Partner.search([('parasut_id', '=', p_id)], limit=1)
-                if not partner and vals.get('vat'):
-                    partner = Partner.search([('vat', '=', vals['vat'])], limit=1)
-                if not partner:
-                    partner = Partner.search([('name', '=', vals['name'])], limit=1)
-
-                if partner:
-                    partner.write(vals)
+                match = by_pid.get(p_id)
+                if not match and vals.get('vat'):
+                    match = by_vat.get(vals['vat'])
+                if not match:
+                    match = by_name.get(vals['name'])
+
+                if isinstance(match, dict):
+                    old_vals = dict(match)
+                    match.update(vals)
+                    updated += 1
+                elif match:
+                    old_vals = known[match]
+                    Partner.browse(match).write(vals)
+                    known[match] = dict(old_vals, **vals)
                     updated += 1
                 else:
-                    Partner.create(vals)
-                    created += 1
+                    old_vals = {}
+                    to_create.append(vals)
+                    match = vals
+                # Keep the indexes current so later items match records touched in this run
+                self._reindex_match(indexes, match, old_vals, vals)
+        created = len(self._create_in_batch(Partner, to_create, etag_endpoint='contacts'))
         return self._return_notification("Contacts Synced", f"{created} created, {updated} updated.")
 
     def action_sync_products(self):
-        batches = self._fetch_from_parasut('products', params={'sort': 'id'})
-        Product = self.env['product.template']
-        created = updated = 0
-        for batch in batches:
-            for item in batch['data']:
+        Product = self.env['product.template'].with_context(**_IMPORT_CONTEXT)
+        tax_index = self._index_taxes()
+        by_pid, by_code = {}, {}
+        indexes = {'parasut_id': by_pid, 'default_code': by_code}
+        known = {}
+        to_create = []
+        updated = 0
+        for batch in self._fetch_from_parasut('products', params={'sort': 'id'}, conditional=True):
+            items = batch['data']
+            existing = Product.search_read([
+                '|',
+                ('parasut_id', 'in', [item['id'] for item in items]),
+                ('default_code', 'in', [item['attributes']['code'] for item in items if item['attributes'].get('code')]),
+            ], ['parasut_id', 'default_code'])
+            self._index_records(existing, 'parasut_id', by_pid)
+            self._index_records(existing, 'default_code', by_code)
+            known.update((row['id'], row) for row in existing)
+            for item in items:
                 attrs = item['attributes']
                 p_id = item['id']
                 vals = {
@@ -191,69 +607,79 @@ class ParasutConnector(models.TransientModel):
                 }
                 vat_rate = attrs.get('vat_rate')
                 if vat_rate:
-                    tax = self.env['account.tax'].search([('amount', '=', float(vat_rate)), ('type_tax_use', '=', 'sale')], limit=1)
-                    if tax:
-                        vals['taxes_id'] = [(6, 0, [tax.id])]
+                    tax_id = self._find_odoo_tax(tax_index, vat_rate, 'sale', price_include=None)
+                    if tax_id:
+                        vals['taxes_id'] = [(6, 0, [tax_id])]
                 
-                product = Product.search([('parasut_id', '=', p_id)], limit=1)
-                if not product and vals.get('default_code'):
-                    product = Product.search([('default_code', '=', vals['default_code'])], limit=1)
+                match = by_pid.get(p_id)
+                if not match and vals.get('default_code'):
+                    match = by_code.get(vals['default_code'])
                 
-                if product:
-                    product.write(vals)
+                if isinstance(match, dict):
+                    old_vals = dict(match)
+                    match.update(vals)
+                    updated += 1
+                elif match:
+                    old_vals = known[match]
+                    Product.browse(match).write(vals)
+                    known[match] = dict(old_vals, **vals)
                     updated += 1
                 else:
-                    Product.create(vals)
-                    created += 1
+                    old_vals = {}
+                    to_create.append(vals)
+                    match = vals
+                self._reindex_match(indexes, match, old_vals, vals)
+        created = len(self._create_in_batch(Product, to_create, etag_endpoint='products'))
         return self._return_notification("Products Synced", f"{created} created, {updated} updated.")
 
     def action_sync_sales_invoices(self):
         params = {'include': 'details,contact', 'sort': '-issue_date'}
-        batches = self._fetch_from_parasut('sales_invoices', params=params)
-        Move = self.env['account.move']
+        Move = self.env['account.move'].with_context(**_IMPORT_CONTEXT)
         Partner = self.env['res.partner']
         Product = self.env['product.template']
+        tax_index = self._index_taxes()
+        today = fields.Date.today()
+        existing = set()
         processed = 0
-        for batch in batches:
+        for batch in self._fetch_from_parasut('sales_invoices', params=params):
+            move_vals_list = []
+            existing.update(self._sql_index('account.move', 'parasut_id', [item['id'] for item in batch['data']], move_type='out_invoice'))
+            included = self._index_included(batch['included'])
+            # Resolve the partners and products referenced by this page with one query each
+            contact_ids = [rel['id'] for item in batch['data'] if (rel := _rel(item, 'contact'))]
+            partners = self._index_records(Partner.search_read([('parasut_id', 'in', contact_ids)], ['parasut_id']), 'parasut_id')
+            product_ids = [
+                rel['id'] for inc in batch['included']
+                if inc['type'] == 'sales_invoice_details' and (rel := _rel(inc, 'product'))
+            ]
+            variants = {}
+            for row in Product.search_read([('parasut_id', 'in', product_ids)], ['parasut_id', 'product_variant_id']):
+                if row['product_variant_id']:
+                    variants.setdefault(row['parasut_id'], row['product_variant_id'][0])
             for item in batch['data']:
                 attrs = item['attributes']
                 p_id = item['id']
-                if Move.search([('parasut_id', '=', p_id), ('move_type', '=', 'out_invoice')], limit=1):
+                if p_id in existing:
                     continue
                 
-                partner_id = False
-                if item.get('relationships', {}).get('contact', {}).get('data'):
-                    contact_id = item['relationships']['contact']['data']['id']
-                    partner_obj = Partner.search([('parasut_id', '=', contact_id)], limit=1)
-                    if partner_obj:
-                        partner_id = partner_obj.id
+                contact_rel = _rel(item, 'contact')
+                partner_id = partners.get(contact_rel['id'], False) if contact_rel else False
                 
                 if not partner_id:
                     continue
                 
                 invoice_lines = []
-                details_rels = item.get('relationships', {}).get('details', {}).get('data', [])
+                details_rels = _rel(item, 'details') or []
                 for det in details_rels:
-                    det_node = self._find_in_included(batch['included'], 'sales_invoice_details', det['id'])
+                    det_node = included.get(('sales_invoice_details', det['id']))
                     if det_node:
                         d_attrs = det_node['attributes']
-                        line_vals = {
-                            'name': d_attrs.get('description') or attrs.get('description') or 'Sales Line',
-                            'quantity': float(d_attrs.get('quantity', 1.0)),
-                            'price_unit': float(d_attrs.get('unit_price', 0.0)),
-                        }
-                        if det_node.get('relationships', {}).get('product', {}).get('data'):
-                            prod_id = det_node['relationships']['product']['data']['id']
-                            product = Product.search([('parasut_id', '=', prod_id)], limit=1)
-                            if product:
-                                line_vals['product_id'] = product.product_variant_id.id
-                        
-                        vat_rate = d_attrs.get('vat_rate')
-                        if vat_rate:
-                            tax = self.env['account.tax'].search([('amount', '=', float(vat_rate)), ('type_tax_use', '=', 'sale'), ('price_include', '=', False)], limit=1)
-                            if tax:
-                                line_vals['tax_ids'] = [(6, 0, [tax.id])]
-                        invoice_lines.append((0, 0, line_vals))
+                        product_rel = _rel(det_node, 'product')
+                        product_id = variants.get(product_rel['id'], False) if product_rel else False
+                        invoice_lines.append(self._prepare_invoice_line(
+                            d_attrs, d_attrs.get('description') or attrs.get('description') or 'Sales Line',
+                            tax_index, 'sale', product_id,
+                        ))
                 
                 if not invoice_lines:
                      invoice_lines.append((0, 0, {'name': attrs.get('description', 'Sale'), 'quantity': 1, 'price_unit': float(attrs.get('net_total', 0))}))
@@ -262,57 +688,57 @@ class ParasutConnector(models.TransientModel):
                     'move_type': 'out_invoice',
                     'parasut_id': p_id,
                     'partner_id': partner_id,
-                    'invoice_date': attrs.get('issue_date') or fields.Date.today(),
-                    'date': attrs.get('issue_date') or fields.Date.today(),
-                    'invoice_date_due': attrs.get('due_date') or attrs.get('issue_date') or fields.Date.today(),
+                    'invoice_date': attrs.get('issue_date') or today,
+                    'date': attrs.get('issue_date') or today,
+                    'invoice_date_due': attrs.get('due_date') or attrs.get('issue_date') or today,
                     'ref': f"SLS-{p_id}",
                     'invoice_line_ids': invoice_lines,
                 }
-                move = Move.create(move_vals)
-                move.action_post()
-                processed += 1
+                move_vals_list.append(move_vals)
+                existing.add(p_id)
+            if move_vals_list:
+                # One create and one post per page so amounts and taxes are computed in a single pass
+                moves = Move.create(move_vals_list)
+                moves.action_post()
+                processed += len(moves)
         return self._return_notification("Sales Invoices Synced", f"{processed} invoices created.")
 
     def action_sync_purchase_bills(self):
         params = {'include': 'details,supplier', 'sort': '-issue_date'}
-        batches = self._fetch_from_parasut('purchase_bills', params=params)
-        Move = self.env['account.move']
+        Move = self.env['account.move'].with_context(**_IMPORT_CONTEXT)
         Partner = self.env['res.partner']
+        tax_index = self._index_taxes()
+        today = fields.Date.today()
+        existing = set()
         processed = 0
-        for batch in batches:
+        for batch in self._fetch_from_parasut('purchase_bills', params=params):
+            move_vals_list = []
+            existing.update(self._sql_index('account.move', 'parasut_id', [item['id'] for item in batch['data']], move_type='in_invoice'))
+            included = self._index_included(batch['included'])
+            supplier_ids = [rel['id'] for item in batch['data'] if (rel := _rel(item, 'supplier'))]
+            partners = self._index_records(Partner.search_read([('parasut_id', 'in', supplier_ids)], ['parasut_id']), 'parasut_id')
             for item in batch['data']:
                 attrs = item['attributes']
                 p_id = item['id']
-                if Move.search([('parasut_id', '=', p_id), ('move_type', '=', 'in_invoice')], limit=1):
+                if p_id in existing:
                     continue
                 
-                partner_id = False
-                if item.get('relationships', {}).get('supplier', {}).get('data'):
-                    supp_id = item['relationships']['supplier']['data']['id']
-                    partner_obj = Partner.search([('parasut_id', '=', supp_id)], limit=1)
-                    if partner_obj:
-                        partner_id = partner_obj.id
+                supplier_rel = _rel(item, 'supplier')
+                partner_id = partners.get(supplier_rel['id'], False) if supplier_rel else False
                 
                 if not partner_id:
                     continue 
                 
                 invoice_lines = []
-                details_rels = item.get('relationships', {}).get('details', {}).get('data', [])
+                details_rels = _rel(item, 'details') or []
                 for det in details_rels:
-                    det_node = self._find_in_included(batch['included'], 'purchase_bill_details', det['id'])
+                    det_node = included.get(('purchase_bill_details', det['id']))
                     if det_node:
                         d_attrs = det_node['attributes']
-                        line_vals = {
-                            'name': d_attrs.get('name') or attrs.get('description') or 'Purchase Line',
-                            'quantity': float(d_attrs.get('quantity', 1.0)),
-                            'price_unit': float(d_attrs.get('unit_price', 0.0)),
-                        }
-                        vat_rate = d_attrs.get('vat_rate')
-                        if vat_rate:
-                            tax = self.env['account.tax'].search([('amount', '=', float(vat_rate)), ('type_tax_use', '=', 'purchase'), ('price_include', '=', False)], limit=1)
-                            if tax:
-                                line_vals['tax_ids'] = [(6, 0, [tax.id])]
-                        invoice_lines.append((0, 0, line_vals))
+                        invoice_lines.append(self._prepare_invoice_line(
+                            d_attrs, d_attrs.get('name') or attrs.get('description') or 'Purchase Line',
+                            tax_index, 'purchase',
+                        ))
                 
                 if not invoice_lines:
                      invoice_lines.append((0, 0, {'name': attrs.get('description', 'Bill'), 'quantity': 1, 'price_unit': float(attrs.get('net_total', 0))}))
@@ -321,89 +747,188 @@ class ParasutConnector(models.TransientModel):
                     'move_type': 'in_invoice',
                     'parasut_id': p_id,
                     'partner_id': partner_id,
-                    'invoice_date': attrs.get('issue_date') or fields.Date.today(),
-                    'date': attrs.get('issue_date') or fields.Date.today(),
-                    'invoice_date_due': attrs.get('due_date') or attrs.get('issue_date') or fields.Date.today(),
+                    'invoice_date': attrs.get('issue_date') or today,
+                    'date': attrs.get('issue_date') or today,
+                    'invoice_date_due': attrs.get('due_date') or attrs.get('issue_date') or today,
                     'ref': f"PRS-{p_id}",
                     'invoice_line_ids': invoice_lines,
                 }
-                move = Move.create(move_vals)
-                move.action_post()
-                processed += 1
+                move_vals_list.append(move_vals)
+                existing.add(p_id)
+            if move_vals_list:
+                moves = Move.create(move_vals_list)
+                moves.action_post()
+                processed += len(moves)
         return self._return_notification("Bills Synced", f"{processed} bills created.")
 
     def action_sync_payments(self):
         """ Sync Payables Payments """
         Move = self.env['account.move']
         Journal = self.env['account.journal']
-        PaymentRegister = self.env['account.payment.register']
+        PaymentRegister = self.env['account.payment.register'].with_context(**_IMPORT_CONTEXT)
         
-        open_payables = Move.search([
+        open_payables = Move.search_read([
             ('move_type', 'in', ['in_invoice', 'entry']),
             ('state', '=', 'posted'),
             ('payment_state', 'in', ['not_paid', 'partial']),
             ('parasut_id', '!=', False)
-        ], limit=50)
+        ], ['parasut_id', 'ref', 'amount_residual'], limit=50)
 
         if not open_payables:
             return self._return_notification("Status", "No unpaid payables found.")
 
-        headers = self._get_parasut_headers()
-        base_url = "https://api.parasut.com/v4"
-        company_id = self.env['ir.config_parameter'].sudo().get_param('parasut.company_id')
+        # Group moves per Parasut endpoint so each group is fetched with one filtered list request
+        buckets = {}
+        for row in open_payables:
+            prefix, sep, _rest = (row['ref'] or '').partition('-')
+            endpoint = _REF_ENDPOINTS.get(prefix + sep, 'purchase_bills')
+            buckets.setdefault(endpoint, []).append(row)
 
+        # Read phase: resolve every payment before the first wizard runs, so searches do not flush
+        # pending payment writes between registrations
+        default_journal_id = Journal.search([('type', '=', 'bank')], limit=1).id
+        journal_by_pid = self._index_records(Journal.search_read([('parasut_id', '!=', False)], ['parasut_id']), 'parasut_id')
         processed_count = 0
-        for move in open_payables:
+        # Moves settled by a single payment of their full residual, by (journal, date): each group is
+        # registered with one wizard over all its moves
+        full_payments = {}
+        partial_payments = []
+        for endpoint, rows in buckets.items():
+            parasut_ids = [row['parasut_id'] for row in rows]
+            params = {'filter[id]': ','.join(parasut_ids), 'include': 'payments'}
+            records = {}
+            for batch in self._fetch_from_parasut(endpoint, params=params):
+                included = self._index_included(batch['included'])
+                for item in batch['data']:
+                    records[item['id']] = (item, included)
+
+            # Records missing from the list response (server error or unsupported filter) are fetched one by one
+            missing_ids = [p_id for p_id in parasut_ids if p_id not in records]
+            fetched = self._fetch_parasut_records(endpoint, missing_ids, params={'include': 'payments'})
+            for record_id, data in fetched.items():
+                records[record_id] = (data.get('data', {}), self._index_included(data.get('included', [])))
+
+            for row in rows:
+                if row['parasut_id'] not in records:
+                    continue
+                try:
+                    main_data, included = records[row['parasut_id']]
+                    payments_rel = _rel(main_data, 'payments') or []
+                    if not payments_rel: continue
+
+                    payment_list = payments_rel if isinstance(payments_rel, list) else [payments_rel]
+                    payments = []
+                    for pay_ref in payment_list:
+                        p_id = pay_ref['id']
+                        payment_obj = included.get(('payments', p_id))
+                        if not payment_obj: continue
+
+                        p_attrs = payment_obj.get('attributes')
+                        amount = float(p_attrs.get('amount') or 0.0)
+                        p_date = p_attrs.get('date')
+
+                        journal_id = False
+                        acc_rel = _rel(payment_obj, 'account')
+                        if acc_rel:
+                            journal_id = journal_by_pid.get(acc_rel['id'], False)
+
+                        journal_id = journal_id or default_journal_id
+                        if not journal_id: continue
+                        payments.append((p_id, amount, p_date, journal_id))
+                except Exception as e:
+                    _logger.error("Error syncing payment for %s: %s", row['ref'], str(e))
+                    continue
+
+                if len(payments) == 1 and float_compare(payments[0][1], row['amount_residual'], precision_digits=2) == 0:
+                    p_id, _amount, p_date, journal_id = payments[0]
+                    full_payments.setdefault((journal_id, p_date), {})[row['id']] = f"{row['ref']} - Pay: {p_id}"
+                else:
+                    partial_payments.extend((row, payment) for payment in payments)
+                processed_count += 1
+
+        # Write phase: payment registration stays on this thread, the ORM cursor is not thread-safe
+        for row, (p_id, amount, p_date, journal_id) in partial_payments:
             try:
-                endpoint = "purchase_bills"
-                if move.ref and move.ref.startswith('MAAS-'): endpoint = "salaries"
-                elif move.ref and move.ref.startswith('VERGI-'): endpoint = "taxes"
-                
-                url = f"{base_url}/{company_id}/{endpoint}/{move.parasut_id}"
-                params = {'include': 'payments'} 
-                response = requests.get(url, headers=headers, params=params, timeout=10)
-                if response.status_code != 200: continue
-
-                data = response.json()
-                main_data = data.get('data', {})
-                included = data.get('included', [])
-                payments_rel = main_data.get('relationships', {}).get('payments', {}).get('data', [])
-                if not payments_rel: continue
-                
-                payment_list = payments_rel if isinstance(payments_rel, list) else [payments_rel]
-                for pay_ref in payment_list:
-                    p_id = pay_ref['id']
-                    payment_obj = self._find_in_included(included, 'payments', p_id)
-                    if not payment_obj: continue
-                    
-                    p_attrs = payment_obj.get('attributes')
-                    amount = float(p_attrs.get('amount') or 0.0)
-                    p_date = p_attrs.get('date')
-                    
-                    journal_id = False
-                    acc_rel = payment_obj.get('relationships', {}).get('account', {}).get('data') 
-                    if acc_rel:
-                        j_finder = Journal.search([('parasut_id', '=', acc_rel['id'])], limit=1)
-                        if j_finder: journal_id = j_finder.id
-                    
-                    if not journal_id:
-                        journal_id = Journal.search([('type', '=', 'bank')], limit=1).id
-                    
-                    if not journal_id: continue
-                        
-                    ctx = {'active_model': 'account.move', 'active_ids': [move.id]}
-                    register = PaymentRegister.with_context(ctx).create({
+                with self.env.cr.savepoint():
+                    ctx = {'active_model': 'account.move', 'active_ids': [row['id']]}
+                    register = PaymentRegister.with_context(**ctx).create({
                         'amount': amount,
                         'payment_date': p_date,
                         'journal_id': journal_id,
-                        'communication': f"{move.ref} - Pay: {p_id}",
+                        'communication': f"{row['ref']} - Pay: {p_id}",
                     })
                     register.action_create_payments()
             except Exception as e:
-                _logger.error("Error syncing payment for %s: %s", move.ref, str(e))
-            processed_count += 1
+                _logger.error("Error syncing payment for %s: %s", row['ref'], str(e))
+        for (journal_id, p_date), memos in full_payments.items():
+            self._register_full_payments(PaymentRegister, memos, journal_id, p_date)
         return self._return_notification("Payments Synced", f"{processed_count} records checked.")
 
+    def _register_full_payments(self, PaymentRegister, memos, journal_id, p_date):
+        """ Pay the full residual of moves with one register wizard and set each payment's memo. """
+        vals = {'payment_date': p_date, 'journal_id': journal_id, 'group_payment': False}
+        try:
+            with self.env.cr.savepoint():
+                wizard = PaymentRegister.with_context(active_model='account.move', active_ids=list(memos)).create(vals)
+                for payment in wizard._create_payments():
+                    memo = memos.get(payment.invoice_ids[:1].id)
+                    if memo:
+                        payment.memo = memo
+            return
+        except Exception as e:
+            _logger.warning("Grouped payment registration failed, retrying per move: %s", str(e))
+        for move_id, memo in memos.items():
+            try:
+                with self.env.cr.savepoint():
+                    PaymentRegister.with_context(active_model='account.move', active_ids=[move_id]).create(
+                        dict(vals, communication=memo),
+                    ).action_create_payments()
+            except Exception as e:
+                _logger.error("Error syncing payment for move %s: %s", move_id, str(e))
+
+    # --- Background Sync ---
+
+    def action_queue_full_sync(self):
+        """ Queue every sync for the background cron so the web worker is not blocked. """
+        self._enqueue_sync(_SYNC_ACTIONS)
+        return self._return_notification("Sync Queued", "Synchronization will run in the background.")
+
+    @api.model
+    def _enqueue_sync(self, action_names):
+        """ Add sync actions to the queue and wake up the cron that processes it. """
+        params = self.env['ir.config_parameter'].sudo()
+        queue = json.loads(params.get_param('parasut.sync_queue') or '[]')
+        queue += [name for name in action_names if name not in queue]
+        params.set_param('parasut.sync_queue', json.dumps(queue))
+        self.env.ref('parasut_muhasebe_entegrasyonu.ir_cron_parasut_sync_queue')._trigger()
+
+    @api.model
+    def _cron_run_sync_queue(self):
+        """ Run the queued sync actions, committing after each one so a failure does not undo the others. """
+        params = self.env['ir.config_parameter'].sudo()
+        queue = json.loads(params.get_param('parasut.sync_queue') or '[]')
+        if not queue:
+            return
+        params.set_param('parasut.sync_queue', False)
+        # Created before the commit so a rolled-back action does not take the connector row with it
+        connector = self.create({})
+        self.env.cr.commit()
+
+        errors = []
+        for name in _SYNC_ACTIONS:
+            if name not in queue:
+                continue
+            try:
+                getattr(connector, name)()
+                self.env.cr.commit()
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Queued Parasut sync %s failed", name)
+                errors.append(f"{name}: {e}")
+        params.set_param('parasut.sync_last_run', fields.Datetime.to_string(fields.Datetime.now()))
+        params.set_param('parasut.sync_last_error', "\n".join(errors) or False)
+        self.env.cr.commit()
+
     def _return_notification(self, title, message):
          return {
             'type': 'ir.actions.client',
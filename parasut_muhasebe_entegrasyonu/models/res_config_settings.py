@@ -1,10 +1,16 @@
-import requests
 import logging
 from odoo import fields, models, api, _
 from odoo.exceptions import UserError
 
 _logger = logging.getLogger(__name__)
 
+_CREDENTIAL_PARAMS = (
+    ('parasut_client_id', 'parasut.client_id'),
+    ('parasut_client_secret', 'parasut.client_secret'),
+    ('parasut_username', 'parasut.username'),
+    ('parasut_password', 'parasut.password'),
+)
+
 class ResConfigSettings(models.TransientModel):
     _inherit = 'res.config.settings'
 
@@ -17,6 +23,22 @@ class ResConfigSettings(models.TransientModel):
     def action_test_parasut_connection(self):
         """ Tests the connection to Parasut API. """
         self.ensure_one()
+        connector = self.env['parasut.connector']
+        session = connector._get_session(self.parasut_client_id, self.parasut_company_id)
+        # The cached token only proves the saved credentials: probe it only when the form still holds them,
+        # so freshly edited credentials always go through the full grant
+        params = self.env['ir.config_parameter'].sudo()
+        token = None
+        if all(self[field] == params.get_param(key) for field, key in _CREDENTIAL_PARAMS):
+            token = connector._get_cached_token(self.parasut_client_id, self.parasut_username)
+        if token:
+            try:
+                response = session.get("https://api.parasut.com/v4/me", headers={'Authorization': f"Bearer {token}"}, timeout=5)
+                if response.status_code == 200:
+                    return self._parasut_connection_notification()
+                connector._invalidate_token()
+            except Exception as e:
+                _logger.info("Parasut token probe failed, using password grant: %s", str(e))
         token_url = "https://api.parasut.com/oauth/token"
         payload = {
             'client_id': self.parasut_client_id,
@@ -27,20 +49,23 @@ class ResConfigSettings(models.TransientModel):
             'redirect_uri': 'urn:ietf:wg:oauth:2.0:oob',
         }
         try:
-            response = requests.post(token_url, data=payload, timeout=10)
+            response = session.post(token_url, data=payload, headers={'Authorization': None}, timeout=10)
             response.raise_for_status()
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'title': _('Connection Successful'),
-                    'message': _('Successfully authenticated with Parasut!'),
-                    'type': 'success',
-                }
-            }
+            return self._parasut_connection_notification()
         except Exception as e:
             raise UserError(_("Connection Failed: %s") % str(e))
 
+    def _parasut_connection_notification(self):
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Connection Successful'),
+                'message': _('Successfully authenticated with Parasut!'),
+                'type': 'success',
+            }
+        }
+
     def action_parasut_sync_now(self):
         """ Opens the Parasut Connector wizard for manual sync. """
         return {
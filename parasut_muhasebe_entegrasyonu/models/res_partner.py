@@ -3,4 +3,4 @@ from odoo import fields, models
 class ResPartner(models.Model):
     _inherit = 'res.partner'
 
-    parasut_id = fields.Char(string='Parasut Follow ID', help="Unique ID from Parasut", copy=False, index=True)
+    parasut_id = fields.Char(string='Parasut Follow ID', help="Unique ID from Parasut", copy=False, index='btree_not_null')